@@ -5,41 +5,41 @@
 # what each part means.
 
 import os
-from dotenv import load_dotenv  # load environment variables from a .env file
 from pydantic import BaseModel, Field  # define schemas for structured output
+from langgraph.graph import StateGraph, MessagesState, START, END  # small tool-calling graph
+from langgraph.prebuilt import ToolNode, tools_condition  # run tools / route on tool calls
 
-from langchain_openai import ChatOpenAI  # the ChatOpenAI model class
+import cache_setup  # noqa: F401  (installs the global LLM cache)
+from config import settings  # load .env and the OpenAI API key once
+from llm_factory import get_llm  # shared ChatOpenAI models
+from benchmark import benchmark, print_benchmark  # latency measurement helper
 
-# 1. Load environment variables and retrieve the OpenAI API key
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    # If the API key is missing, we cannot proceed
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+# 1. Load settings once per process (reads .env and checks the OpenAI API key)
+settings()
 
-# 2. Initialize the base LLM (ChatOpenAI)
-#    - api_key: secret key for OpenAI
-#    - model: GPT variant (e.g., gpt-3.5-turbo)
+# 2. Get the shared base LLM (ChatOpenAI) from the factory
+#    - model: GPT variant (gpt-4o-mini supports OpenAI Structured Outputs, used below)
 #    - temperature: randomness control (0.0 = deterministic)
-llm = ChatOpenAI(
-    api_key=openai_api_key,
-    model="gpt-3.5-turbo",
-    temperature=0.0
-)
+#    The factory reads the API key and reuses one connection pool per process
+llm = get_llm(model="gpt-4o-mini", temperature=0.0)
 
 # 3. Define a Pydantic schema for structured output
 #    Fields in this schema ensure the model returns data in this shape
+#    (strict mode requires every field, so none of them have defaults)
 class SearchQuery(BaseModel):
     search_query: str = Field(
-        None, description="Query optimized for a web search"
+        description="Query optimized for a web search"
     )
     justification: str = Field(
-        None, description="Why this query is relevant to the user's request"
+        description="Why this query is relevant to the user's request"
     )
 
 # 4. Augment the LLM to produce structured output following our schema
 #    `with_structured_output` wraps the model to enforce schema output
-structured_llm = llm.with_structured_output(SearchQuery)
+#    - method="json_schema": use OpenAI's native Structured Outputs (response_format)
+#      instead of a function-calling wrapper, so no extra tool definition is sent
+#    - strict=True: the API guarantees the reply matches the schema
+structured_llm = llm.with_structured_output(SearchQuery, method="json_schema", strict=True)
 
 # 5. Invoke the augmented LLM with a human question
 print("=== Structured Output Example ===")
@@ -63,11 +63,37 @@ def multiply(a: int, b: int) -> int:
 #    `bind_tools` returns a wrapper that allows the model to call tools
 llm_with_tools = llm.bind_tools([multiply])
 
-# 8. Invoke the tool-augmented LLM with a prompt
+# 8. Build a small graph that runs the requested tool locally
+#    - call_llm: the tool-augmented LLM decides which tool to call
+#    - tools_condition: go to "tools" if the LLM asked for a tool, otherwise END
+#    - tools: run `multiply` in Python, then END
+#    `multiply` is deterministic, so its result IS the answer: we stop there
+#    instead of sending it back to the LLM, saving a second API round trip
+def call_llm(state: MessagesState):
+    return {"messages": [llm_with_tools.invoke(state["messages"])]}
+
+tool_builder = StateGraph(MessagesState)
+tool_builder.add_node("call_llm", call_llm)
+tool_builder.add_node("tools", ToolNode([multiply]))
+tool_builder.add_edge(START, "call_llm")
+tool_builder.add_conditional_edges("call_llm", tools_condition)
+tool_builder.add_edge("tools", END)
+tool_graph = tool_builder.compile()
+
+# 9. Invoke the graph with a prompt
 print("\n=== Tool Binding Example ===")
 tool_question = "What is 2 times 3?"
-tool_result = llm_with_tools.invoke(tool_question)
+tool_state = tool_graph.invoke({"messages": [("user", tool_question)]})
 
-# 9. Inspect the tool calls made by the LLM
+# 10. Inspect the tool calls made by the LLM and the locally computed result
 #    `tool_calls` holds any tool invocation requests from the model
+tool_result = tool_state["messages"][1]
 print("Tool calls:", tool_result.tool_calls)
+if tool_result.tool_calls:
+    print("Tool result:", tool_state["messages"][-1].content)
+
+# 11. Optional: measure latency of both calls (run with BENCHMARK=1)
+if os.getenv("BENCHMARK"):
+    print("\n=== Benchmark ===")
+    print_benchmark("structured_llm", benchmark(lambda: structured_llm.invoke(question)))
+    print_benchmark("llm_with_tools", benchmark(lambda: llm_with_tools.invoke(tool_question)))
@@ -0,0 +1,38 @@
+# benchmark.py
+#
+# This module provides a tiny latency benchmark for the example scripts.
+# Wrap any call (e.g. `lambda: chain.invoke({...})`) and it reports
+# mean / median / p95 / min / max wall-clock time in seconds.
+# The LLM caches from cache_setup.py are switched off while timing, so every
+# iteration measures a real (uncached) call, even for inputs the demo already ran.
+
+import statistics
+import time
+
+from cache_setup import caching_disabled
+
+
+# 1. Time a callable over several iterations
+def benchmark(fn, iterations=10):
+    """Call `fn` `iterations` times and return latency statistics in seconds."""
+    times = []
+    with caching_disabled():
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "p95": times[int(len(times) * 0.95)],
+        "min": times[0],
+        "max": times[-1],
+    }
+
+
+# 2. Print the statistics in a readable form
+def print_benchmark(name, stats):
+    """Print the result of `benchmark` on one line."""
+    summary = ", ".join(f"{key}={value * 1000:.1f}ms" for key, value in stats.items())
+    print(f"[benchmark] {name}: {summary}")
@@ -0,0 +1,92 @@
+# cache_setup.py
+#
+# This module installs a process-wide LangChain LLM cache.
+# Import it before creating a ChatOpenAI model: every chat model in the process
+# then checks the cache first, so a prompt that was already answered is returned
+# instantly instead of making another round trip to the OpenAI API.
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+
+
+# 1. Install the global cache
+#    - No database_path: keep responses in memory (good for the example scripts)
+#    - database_path: persist responses in SQLite so they survive server restarts
+def setup_llm_cache(database_path: Optional[str] = None):
+    """Install the global LLM cache and return it."""
+    if database_path:
+        # SQLiteCache lives in langchain-community, so only import it when needed
+        from langchain_community.cache import SQLiteCache
+        cache = SQLiteCache(database_path=database_path)
+    else:
+        cache = InMemoryCache()
+    set_llm_cache(cache)
+    return cache
+
+
+# 2. Default to the in-memory cache as soon as this module is imported
+if get_llm_cache() is None:
+    setup_llm_cache()
+
+
+# 3. Input-aware cache for prompt-template chains
+#    The exact-match LLM cache above misses prompts that only differ in the
+#    casing or spacing of their filled-in values ("Cats" vs "cats ").
+#    Here the cache key is the chain (prompt template | model) plus its
+#    normalized input values, so those near-duplicates share a single LLM call.
+#    It is an LRU capped at TEMPLATE_CACHE_SIZE entries, so a long-running or
+#    batched process doesn't keep every response forever.
+TEMPLATE_CACHE_SIZE = 256
+_template_cache = OrderedDict()
+#    `batch` runs cached_invoke from worker threads, so every read/write of the
+#    OrderedDict happens under this lock (the LLM call itself runs outside it)
+_template_cache_lock = threading.Lock()
+_template_cache_enabled = True  # Switched off by `caching_disabled()`
+
+
+def _normalize(value) -> str:
+    """Lowercase an input value and collapse its whitespace."""
+    return " ".join(str(value).split()).casefold()
+
+
+def cached_invoke(chain, **inputs):
+    """Invoke `chain` with `inputs`, reusing earlier results for equivalent inputs."""
+    if not _template_cache_enabled:
+        return chain.invoke(inputs)
+    key = (
+        id(chain),
+        tuple(sorted((name, _normalize(value)) for name, value in inputs.items())),
+    )
+    with _template_cache_lock:
+        if key in _template_cache:
+            _template_cache.move_to_end(key)  # Mark as most recently used
+            return _template_cache[key]
+    result = chain.invoke(inputs)
+    with _template_cache_lock:
+        _template_cache[key] = result
+        _template_cache.move_to_end(key)
+        if len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)  # Drop the least recently used entry
+    return result
+
+
+# 4. Turn both caches off for a block of code
+#    benchmark.py uses this so every timed call really goes to the OpenAI API
+#    instead of being answered from a cache filled by an earlier run
+@contextmanager
+def caching_disabled():
+    """Temporarily disable the global LLM cache and the template cache."""
+    global _template_cache_enabled
+    previous_cache = get_llm_cache()
+    set_llm_cache(None)
+    _template_cache_enabled = False
+    try:
+        yield
+    finally:
+        set_llm_cache(previous_cache)
+        _template_cache_enabled = True
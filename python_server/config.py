@@ -0,0 +1,30 @@
+# config.py
+#
+# This module loads the server settings once per process.
+# Every module calls `settings()` instead of running `load_dotenv()` and
+# checking `OPENAI_API_KEY` itself: the .env file is read on the first call
+# and the same frozen Settings object is returned afterwards.
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+# 1. The settings every module needs
+@dataclass(frozen=True)
+class Settings:
+    openai_api_key: str
+
+
+# 2. Load and validate the settings on first use
+@lru_cache(maxsize=1)
+def settings() -> Settings:
+    """Load .env (once) and return the process-wide Settings."""
+    load_dotenv()
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        # If the API key is missing, we cannot proceed
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return Settings(openai_api_key=openai_api_key)
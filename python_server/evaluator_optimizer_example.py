@@ -5,23 +5,24 @@
 # Each step is explained in detail for clarity and learning.
 
 import os
-from dotenv import load_dotenv
 from typing_extensions import TypedDict, Literal
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, START, END
 
-# 1. Load environment variables and initialize the LLM
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+from cache_setup import cached_invoke  # also installs the global LLM cache
+from config import settings
+from llm_factory import get_llm
+from benchmark import benchmark, print_benchmark
 
-llm = ChatOpenAI(
-    api_key=openai_api_key,
-    model="gpt-3.5-turbo",
-    temperature=0.0
-)
+# 1. Load settings once per process and initialize the LLMs
+settings()
+
+# Both steps use the small, fast gpt-4o-mini: writing a short joke and picking
+# "funny"/"not funny" plus short feedback don't need a larger model
+# (save gpt-4o for more complex production paths)
+gen_llm = get_llm(model="gpt-4o-mini", temperature=0.0)
+eval_llm = get_llm(model="gpt-4o-mini", temperature=0.0)
 
 # 2. Define a schema for structured evaluation feedback using Pydantic
 #    This ensures the evaluator's output always has the same fields and types
@@ -33,10 +34,12 @@ class Feedback(BaseModel):
         description="If the joke is not funny, provide feedback on how to improve it."
     )
 
-# 3. Wrap the LLM to always return structured feedback as a Feedback object
+# 3. Wrap the evaluator LLM to always return structured feedback as a Feedback object
 #    This makes evaluation results predictable and easy to use in code
 #    (like a TypeScript type for LLM output)
-evaluator = llm.with_structured_output(Feedback)
+#    method="json_schema" + strict=True use OpenAI's native Structured Outputs,
+#    which skips the function-calling wrapper and guarantees a parseable reply
+evaluator = eval_llm.with_structured_output(Feedback, method="json_schema", strict=True)
 
 # 4. Define the workflow state (data passed between steps)
 #    This is like a shared memory for the workflow
@@ -45,38 +48,59 @@ class State(TypedDict):
     topic: str
     feedback: str
     funny_or_not: str
+    iteration: int  # How many jokes have been generated so far
+
+# Stop improving after this many generated jokes, even if none was graded funny
+#    (each extra round costs two LLM calls)
+MAX_ITERATIONS = 3
+
+# 5. Prompt templates and chains used by the nodes below
+#    Templates are built once here and piped into their model (`prompt | llm`).
+#    Calls go through `cached_invoke`, so equivalent inputs
+#    (e.g. "Cats" and "cats") reuse one LLM response; in the loop this means
+#    a (topic, feedback) pair that was already answered skips the generator call
+JOKE_PROMPT = ChatPromptTemplate.from_template("Write a joke about {topic}")
+JOKE_WITH_FEEDBACK_PROMPT = ChatPromptTemplate.from_template(
+    "Write a joke about {topic} but take into account the feedback: {feedback}"
+)
+GRADE_PROMPT = ChatPromptTemplate.from_template("Grade the joke {joke}")
 
-# 5. Node: Joke Generator
+joke_chain = JOKE_PROMPT | gen_llm
+joke_with_feedback_chain = JOKE_WITH_FEEDBACK_PROMPT | gen_llm
+grade_chain = GRADE_PROMPT | evaluator
+
+# 6. Node: Joke Generator
 #    Generates a joke about the topic, optionally using feedback if present
 def llm_call_generator(state: State):
     """LLM generates a joke, using feedback if available."""
     if state.get("feedback"):
         # If feedback exists, use it to improve the joke
-        msg = llm.invoke(
-            f"Write a joke about {state['topic']} but take into account the feedback: {state['feedback']}"
+        msg = cached_invoke(
+            joke_with_feedback_chain, topic=state["topic"], feedback=state["feedback"]
         )
     else:
         # Otherwise, just write a joke about the topic
-        msg = llm.invoke(f"Write a joke about {state['topic']}")
-    return {"joke": msg.content}
+        msg = cached_invoke(joke_chain, topic=state["topic"])
+    return {"joke": msg.content, "iteration": state.get("iteration", 0) + 1}
 
-# 6. Node: Joke Evaluator
+# 7. Node: Joke Evaluator
 #    Grades the joke as "funny" or "not funny" and provides feedback if needed
 def llm_call_evaluator(state: State):
     """LLM evaluates the joke and gives feedback."""
-    grade = evaluator.invoke(f"Grade the joke {state['joke']}")
+    grade = cached_invoke(grade_chain, joke=state["joke"])
     return {"funny_or_not": grade.grade, "feedback": grade.feedback}
 
-# 7. Conditional Edge: Route based on evaluation
-#    If the joke is funny, accept and end. If not, loop back to generator with feedback
+# 8. Conditional Edge: Route based on evaluation
+#    If the joke is funny (or we ran out of attempts), accept and end.
+#    If not, loop back to generator with feedback
 def route_joke(state: State):
-    """Route to END if funny, or back to generator if not funny."""
-    if state["funny_or_not"] == "funny":
+    """Route to END if funny or out of attempts, or back to generator if not funny."""
+    if state["funny_or_not"] == "funny" or state.get("iteration", 0) >= MAX_ITERATIONS:
         return "Accepted"
     elif state["funny_or_not"] == "not funny":
         return "Rejected + Feedback"
 
-# 8. Build the workflow graph
+# 9. Build the workflow graph
 #    This sets up the sequence and logic connecting each step
 optimizer_builder = StateGraph(State)
 
@@ -99,17 +123,36 @@ optimizer_builder.add_conditional_edges(
     },
 )
 
-# 9. Compile the workflow (finalize for execution)
+# 10. Compile the workflow (finalize for execution)
 optimizer_workflow = optimizer_builder.compile()
 
-# 10. Run the workflow with an example topic
+# 11. Run the workflow for many topics at once
+#     `batch` runs one workflow per topic concurrently (up to max_concurrency),
+#     so N topics take about as long as the slowest one instead of N in a row
+def generate_jokes(topics, max_concurrency=10):
+    """Run the evaluator-optimizer workflow for each topic in parallel."""
+    return optimizer_workflow.batch(
+        [{"topic": topic} for topic in topics],
+        config={"max_concurrency": max_concurrency},
+    )
+
+# 12. Run the workflow with example topics
 if __name__ == "__main__":
-    # Start with a topic (e.g., "Cats"). The workflow will generate, evaluate, and improve the joke as needed.
-    state = optimizer_workflow.invoke({"topic": "Cats"})
-    print("Final joke:")
-    print(state["joke"])
-    print("\nEvaluation:")
-    print(state["funny_or_not"])
-    if state["funny_or_not"] == "not funny":
-        print("Feedback for improvement:")
-        print(state["feedback"])
+    # Start with some topics (e.g., "Cats"). The workflow will generate, evaluate, and improve each joke as needed.
+    topics = ["Cats", "Dogs", "Coffee"]
+    for topic, state in zip(topics, generate_jokes(topics)):
+        print(f"=== {topic} ===")
+        print("Final joke:")
+        print(state["joke"])
+        print("\nEvaluation:")
+        print(state["funny_or_not"])
+        if state["funny_or_not"] == "not funny":
+            print("Feedback for improvement:")
+            print(state["feedback"])
+        print()
+
+    # Optional: measure latency (run with BENCHMARK=1)
+    if os.getenv("BENCHMARK"):
+        print_benchmark(
+            "optimizer_workflow", benchmark(lambda: optimizer_workflow.invoke({"topic": "Cats"}))
+        )
@@ -5,55 +5,84 @@
 # Each node processes the state and passes results to the next node.
 
 import os
-from dotenv import load_dotenv
+import re
+from functools import lru_cache
 from typing_extensions import TypedDict
-from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph, START, END
 
-# 1. Load environment variable for OpenAI key
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
-
-# 2. Initialize the base LLM
-llm = ChatOpenAI(
-    api_key=openai_api_key,
-    model="gpt-3.5-turbo",
-    temperature=0.0
-)
+import cache_setup  # noqa: F401  (installs the global LLM cache)
+from config import settings
+from llm_factory import get_llm
+from benchmark import benchmark, print_benchmark
+
+# 1. Load settings once per process (reads .env and checks the OpenAI API key)
+settings()
+
+# 2. Get the shared base LLM from the factory
+llm = get_llm(model="gpt-3.5-turbo", temperature=0.0)
 
 # 3. Define the graph state (like a schema for the workflow)
 class State(TypedDict):
     topic: str
     joke: str
     improved_joke: str
-    final_joke: str
+    twisted_joke: str
+
+# 4. Build the prompt chains once (prompt template | LLM | plain-text output)
+generate_chain = (
+    ChatPromptTemplate.from_template("Write a short joke about {topic}")
+    | llm
+    | StrOutputParser()
+)
+improve_chain = (
+    ChatPromptTemplate.from_template("Make this joke funnier by adding wordplay: {joke}")
+    | llm
+    | StrOutputParser()
+)
+twist_chain = (
+    ChatPromptTemplate.from_template("Add a surprising twist to this joke: {joke}")
+    | llm
+    | StrOutputParser()
+)
 
-# 4. Define workflow nodes (each a function that takes and returns part of state)
+# 5. Define workflow nodes (each a function that takes and returns part of state)
 def generate_joke(state: State):
     """First LLM call to generate initial joke"""
-    msg = llm.invoke(f"Write a short joke about {state['topic']}")
-    return {"joke": msg.content}
+    return {"joke": generate_chain.invoke({"topic": state["topic"]})}
 
+# The next two nodes only depend on the initial joke, not on each other,
+# so the graph runs them side by side (see the edges below)
 def improve_joke(state: State):
-    """Second LLM call to improve the joke"""
-    msg = llm.invoke(f"Make this joke funnier by adding wordplay: {state['joke']}")
-    return {"improved_joke": msg.content}
+    """Second LLM call to improve the joke with wordplay"""
+    return {"improved_joke": improve_chain.invoke({"joke": state["joke"]})}
+
+def twist_joke(state: State):
+    """Second LLM call (in parallel) to add a twist to the joke"""
+    return {"twisted_joke": twist_chain.invoke({"joke": state["joke"]})}
+
+# 6. Conditional edge: only continue if the joke has a punchline
+#    The pattern is compiled once, and results are memoized per joke text,
+#    so replaying identical jokes (e.g. while debugging) skips the check
+_PUNCHLINE_RE = re.compile(r"[?!]")
 
-def polish_joke(state: State):
-    """Third LLM call for final polish"""
-    msg = llm.invoke(f"Add a surprising twist to this joke: {state['improved_joke']}")
-    return {"final_joke": msg.content}
+@lru_cache(maxsize=4096)
+def _has_punchline(joke: str) -> bool:
+    return _PUNCHLINE_RE.search(joke) is not None
 
-# 5. Conditional edge: only continue if the joke has a punchline
 def check_punchline(state: State):
     """Gate function to check if the joke has a punchline"""
-    if "?" in state["joke"] or "!" in state["joke"]:
-        return "Pass"
-    return "Fail"
+    return "Pass" if _has_punchline(state["joke"]) else "Fail"
 
-# 6. Build the workflow graph
+# Fan out to both improvement branches when the gate passes
+def route_after_gate(state: State):
+    """Send the joke to both improvement steps at once, or stop if it has no punchline"""
+    if check_punchline(state) == "Pass":
+        return ["improve_joke", "twist_joke"]
+    return END
+
+# 7. Build the workflow graph
 # This section sets up the sequence and logic of how each node (step) connects.
 # Think of this as drawing a flowchart for your AI workflow.
 
@@ -63,8 +92,8 @@ workflow = StateGraph(State)
 # Add nodes to the graph.
 # Each node is a step in the workflow, represented by a function.
 workflow.add_node("generate_joke", generate_joke)   # Step 1: Generate an initial joke
-workflow.add_node("improve_joke", improve_joke)     # Step 2: Make the joke funnier
-workflow.add_node("polish_joke", polish_joke)       # Step 3: Add a twist to the joke
+workflow.add_node("improve_joke", improve_joke)     # Step 2a: Make the joke funnier
+workflow.add_node("twist_joke", twist_joke)         # Step 2b: Add a twist to the joke
 
 # Add edges to define the order and logic of execution.
 # Edges connect nodes and determine how data flows from one step to the next.
@@ -73,22 +102,19 @@ workflow.add_node("polish_joke", polish_joke)       # Step 3: Add a twist to the
 workflow.add_edge(START, "generate_joke")
 
 # After generating a joke, check if it passes the punchline gate.
-# If 'check_punchline' returns 'Pass', continue to 'improve_joke'.
-# If 'Fail', end the workflow early (no improvement or polish).
+# If it passes, run 'improve_joke' and 'twist_joke' in parallel (both LLM calls fly at once).
+# If not, end the workflow early (no improvement or twist).
 workflow.add_conditional_edges(
-    "generate_joke",          # From this node
-    check_punchline,          # Use this function to decide
-    {"Pass": "improve_joke", # If Pass, go to improve_joke
-     "Fail": END}            # If Fail, stop the workflow
+    "generate_joke",                           # From this node
+    route_after_gate,                          # Use this function to decide
+    ["improve_joke", "twist_joke", END]        # Possible next steps
 )
 
-# After improving the joke, always go to the polish_joke step
-workflow.add_edge("improve_joke", "polish_joke")
-
-# After polishing the joke, end the workflow
-workflow.add_edge("polish_joke", END)
+# After both branches finish, end the workflow
+workflow.add_edge("improve_joke", END)
+workflow.add_edge("twist_joke", END)
 
-# 7. Compile the workflow
+# 8. Compile the workflow
 # This step finalizes the graph and prepares it for execution.
 # After compiling, you can call 'chain.invoke(...)' to run the workflow.
 chain = workflow.compile()
@@ -98,17 +124,34 @@ chain = workflow.compile()
 from IPython.display import Image, display
 
 
-# 8. Run the workflow with an example topic
+# 9. Run the workflow for many topics at once
+# 'chain.batch(...)' runs one workflow per topic concurrently (up to max_concurrency),
+# so N topics take about as long as the slowest one instead of N in a row.
+def generate_jokes(topics, max_concurrency=10):
+    """Run the prompt chain for each topic in parallel."""
+    return chain.batch(
+        [{"topic": topic} for topic in topics],
+        config={"max_concurrency": max_concurrency},
+    )
+
+# 10. Run the workflow with example topics
 if __name__ == "__main__":
-    state = chain.invoke({"topic": "cats"})
-    print("Initial joke:")
-    print(state.get("joke", ""))
-    print("\n--- --- ---\n")
-    if "improved_joke" in state:
-        print("Improved joke:")
-        print(state.get("improved_joke", ""))
+    topics = ["cats", "dogs", "coffee"]
+    for topic, state in zip(topics, generate_jokes(topics)):
+        print(f"=== {topic} ===")
+        print("Initial joke:")
+        print(state.get("joke", ""))
         print("\n--- --- ---\n")
-        print("Final joke:")
-        print(state.get("final_joke", ""))
-    else:
-        print("Joke failed quality gate - no punchline detected!")
+        if "improved_joke" in state:
+            print("Improved joke:")
+            print(state.get("improved_joke", ""))
+            print("\n--- --- ---\n")
+            print("Twisted joke:")
+            print(state.get("twisted_joke", ""))
+        else:
+            print("Joke failed quality gate - no punchline detected!")
+        print()
+
+    # Optional: measure latency (run with BENCHMARK=1)
+    if os.getenv("BENCHMARK"):
+        print_benchmark("chain", benchmark(lambda: chain.invoke({"topic": "cats"})))
@@ -0,0 +1,34 @@
+# llm_factory.py
+#
+# This module hands out shared ChatOpenAI models.
+# Every module asks `get_llm(...)` for its model instead of building its own,
+# so the whole process shares one pool of HTTP connections to OpenAI
+# (and one model object per model/temperature combination).
+
+from functools import lru_cache
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from config import settings
+
+# 1. Shared HTTP clients
+#    Reusing these keeps TCP/TLS connections to OpenAI alive across calls
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+_shared_http_client = httpx.Client(limits=_LIMITS)
+_shared_http_async_client = httpx.AsyncClient(limits=_LIMITS)
+
+
+# 2. Cached model factory
+#    Same arguments -> same ChatOpenAI instance for the life of the process
+@lru_cache(maxsize=4)
+def get_llm(model: str = "gpt-3.5-turbo", temperature: float = 0.0, streaming: bool = False):
+    """Return the shared ChatOpenAI model for these settings."""
+    return ChatOpenAI(
+        api_key=settings().openai_api_key,
+        model=model,
+        temperature=temperature,
+        streaming=streaming,
+        http_client=_shared_http_client,
+        http_async_client=_shared_http_async_client,
+    )
@@ -1,22 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional, TypedDict, Annotated
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage
+import json
+import uuid
+from contextlib import asynccontextmanager
+import msgspec
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langgraph.graph import StateGraph, MessagesState, START, END
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
-# Load environment variables from .env file
-load_dotenv()
+from cache_setup import setup_llm_cache
+from config import settings
+from llm_factory import get_llm
 
-# Get OpenAI API key from environment
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+# Load settings once per process (reads .env and checks the OpenAI API key)
+settings()
+
+# Persist LLM responses in SQLite so repeated prompts skip the API call,
+# even across reloader restarts
+setup_llm_cache(database_path=".langchain_cache.db")
+
+# Compile the chat graph once at startup, with a SQLite checkpointer that keeps
+# each thread's conversation on the server (see `chat_builder` below)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncSqliteSaver.from_conn_string("chat.db") as checkpointer:
+        app.state.chat_graph = chat_builder.compile(checkpointer=checkpointer)
+        yield
 
 # Initialize FastAPI app
-app = FastAPI(title="LangGraph Chat API")
+app = FastAPI(title="LangGraph Chat API", lifespan=lifespan)
 
 # Add CORS middleware to allow requests from your Next.js app
 app.add_middleware(
@@ -28,38 +42,82 @@ app.add_middleware(
 )
 
 # Define request and response models
-class Message(BaseModel):
+# msgspec structs decode and validate JSON much faster than pydantic models,
+# which keeps per-request overhead outside the LLM call small
+class Message(msgspec.Struct):
     role: str
     content: str
 
-class ChatRequest(BaseModel):
+class ChatRequest(msgspec.Struct):
     messages: List[Message]
     thread_id: Optional[str] = None
 
-class ChatResponse(BaseModel):
+class ChatResponse(msgspec.Struct):
     content: str
     thread_id: str
 
-# Initialize the language model
-model = ChatOpenAI(
-    api_key=openai_api_key,
-    model="gpt-3.5-turbo",
-    temperature=0
-)
+# Decode and validate the raw request body as a ChatRequest
+async def decode_chat_request(request: Request) -> ChatRequest:
+    try:
+        return msgspec.json.decode(await request.body(), type=ChatRequest)
+    except (msgspec.DecodeError, msgspec.ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+# Get the shared language model from the factory
+# (it reuses one pooled HTTP client, so TCP/TLS connections to OpenAI are kept alive across requests)
+model = get_llm(model="gpt-3.5-turbo", temperature=0.0, streaming=True)
+
+# Map request roles to LangChain message classes (unknown roles are skipped)
+MESSAGE_CLASSES = {
+    "user": HumanMessage,
+    "assistant": AIMessage,
+    "system": SystemMessage,
+}
+
+# Convert request messages to LangChain format
+def to_langchain_messages(messages):
+    return [
+        MESSAGE_CLASSES[msg.role](content=msg.content)
+        for msg in messages
+        if msg.role in MESSAGE_CLASSES
+    ]
+
+# Define the chat graph node that calls the model
+async def call_model(state: MessagesState):
+    # Call the model with the messages (async, so other requests are served meanwhile)
+    response = await model.ainvoke(state["messages"])
+    return {"messages": [response]}
 
-# Define a simple chat function that uses the model directly
-# This is a simplified approach without using LangGraph
-async def process_chat(messages, thread_id="default"):
-    # Convert messages to LangChain format
-    lc_messages = []
-    for msg in messages:
-        if msg.role == "user":
-            lc_messages.append(HumanMessage(content=msg.content))
-        elif msg.role == "assistant":
-            lc_messages.append(AIMessage(content=msg.content))
+# Build the chat graph once at import time
+# It is compiled once in `lifespan`, and every request reuses that compiled graph
+chat_builder = StateGraph(MessagesState)
+chat_builder.add_node("call_model", call_model)
+chat_builder.add_edge(START, "call_model")
+chat_builder.add_edge("call_model", END)
+
+# Work out which messages a request adds to its thread
+# The checkpointer already stores earlier turns, so for a known thread only the
+# latest message (the new user turn) is added instead of replaying the history.
+# The request must end with that user message; anything else is rejected with 422
+# so the graph never re-answers the stored history or stores a client's assistant turn
+async def prepare_turn(messages, thread_id):
+    if not messages or messages[-1].role != "user":
+        raise HTTPException(status_code=422, detail="The last message must have role 'user'")
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = await app.state.chat_graph.aget_state(config)
+    if snapshot.values.get("messages"):
+        lc_messages = [HumanMessage(content=messages[-1].content)]
+    else:
+        lc_messages = to_langchain_messages(messages)
+    return {"messages": lc_messages}, config
+
+# Define a simple chat function that runs the compiled graph
+async def process_chat(messages, thread_id):
+    graph_input, config = await prepare_turn(messages, thread_id)
     
-    # Call the model with the messages
-    response = model.invoke(lc_messages)
+    # Run the graph; the AI's reply is the last message in the resulting state
+    result = await app.state.chat_graph.ainvoke(graph_input, config=config)
+    response = result["messages"][-1]
     
     # Return the AI's response
     return {
@@ -68,18 +126,58 @@ async def process_chat(messages, thread_id="default"):
     }
 
 # Define the chat endpoint
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    # Process the chat request
-    result = await process_chat(request.messages, request.thread_id or "default")
+@app.post("/chat")
+async def chat(raw_request: Request):
+    request = await decode_chat_request(raw_request)
+
+    # Process the chat request (a request without a thread_id starts a new thread)
+    result = await process_chat(request.messages, request.thread_id or str(uuid.uuid4()))
     
     # Return response
-    return ChatResponse(
+    response = ChatResponse(
         content=result["content"],
         thread_id=result["thread_id"]
     )
+    return Response(msgspec.json.encode(response), media_type="application/json")
+
+# Define the streaming chat endpoint
+# Tokens are sent as Server-Sent Events as soon as the model produces them,
+# so the client can render the reply before the whole response is generated
+@app.post("/chat/stream")
+async def chat_stream(raw_request: Request):
+    request = await decode_chat_request(raw_request)
+    thread_id = request.thread_id or str(uuid.uuid4())
+    graph_input, config = await prepare_turn(request.messages, thread_id)
 
-# Run with: uvicorn main:app --reload
+    async def event_stream():
+        # stream_mode="messages" yields the model's tokens as they arrive,
+        # while the checkpointer still saves the finished turn to the thread
+        async for chunk, _metadata in app.state.chat_graph.astream(
+            graph_input, config=config, stream_mode="messages"
+        ):
+            if chunk.content:
+                yield f"data: {json.dumps({'content': chunk.content, 'thread_id': thread_id})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+# Run with: python main.py (production) or DEV=1 python main.py (auto-reload)
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+
+    if os.getenv("DEV") == "1":
+        # Development: single process that restarts on code changes
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        # Production: several worker processes, each on the fastest event loop and
+        # HTTP parser available ("auto" picks uvloop/httptools from uvicorn[standard],
+        # and falls back to asyncio/h11 where they are not available, e.g. Windows)
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+            loop="auto",
+            http="auto",
+        )
@@ -3,100 +3,98 @@
 # This script uses a strict evaluator-optimizer workflow to generate and refine resume bullet points
 # for a given job. It uses LangGraph and LangChain with detailed, beginner-friendly explanations.
 
+import asyncio
+import hashlib
+import operator
 import os
-from dotenv import load_dotenv
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Annotated
 from typing_extensions import TypedDict, Literal
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 
-# 1. Load environment variables and initialize the LLM
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+from config import settings
+from llm_factory import get_llm
 
-llm = ChatOpenAI(
-    api_key=openai_api_key,
-    model="gpt-4o-2024-08-06",
-    temperature=0.2
-)
+# 1. Load settings once per process and initialize the LLM
+settings()
+
+llm = get_llm(model="gpt-4o-2024-08-06", temperature=0.2)
 
 # 2. Define the strict evaluator schema for bullet points
 class BulletPointEvaluation(BaseModel):
     grade: Literal["pass", "fail"] = Field(description="Does the bullet point meet all requirements?")
     feedback: str = Field(description="If fail, provide feedback on how to improve this bullet point.")
 
-# 3. Wrap the LLM to always return structured evaluation for each bullet point
-evaluator = llm.with_structured_output(BulletPointEvaluation)
+# The generator returns the experience's bullet points directly, so no text parsing is needed
+class Experience(BaseModel):
+    bullets: list[str] = Field(description="The requested resume bullet points, in order.")
 
-# 4. Define the workflow state
+# Wrap the LLM to always return the bullet points as an Experience object
+generator = llm.with_structured_output(Experience, method="json_schema", strict=True)
+
+# 3. Wrap the LLM to always return structured evaluation for each bullet point
+#    method="json_schema" + strict=True send the schema as OpenAI's native response_format
+#    (no function-calling wrapper), so every reply is valid JSON for the schema in one call
+evaluator = llm.with_structured_output(BulletPointEvaluation, method="json_schema", strict=True)
+
+# 4. One record per bullet point
+#    Text, grade and feedback travel together, so nodes never have to keep
+#    parallel lists in step. Records are frozen: nodes build updated copies with `replace`
+@dataclass(frozen=True)
+class Bullet:
+    text: str = ""
+    grade: str = ""     # "pass", "fail", or "" while not graded yet
+    feedback: str = ""
+    key: str = ""       # Evaluation cache key for (job, text)
+
+# Reducer for the bullets
+# A list replaces all bullets (generate_experience);
+# a {index: Bullet} dict, as returned by each parallel evaluate_one branch, updates just those slots
+def update_bullets(existing, new):
+    if isinstance(new, dict):
+        merged = list(existing)
+        for idx, bullet in new.items():
+            merged[idx] = bullet
+        return merged
+    return new
+
+# Define the workflow state
 class State(TypedDict):
     job: str
-    experience: str
-    bullet_points: list[str]
-    grades: list[str]
-    feedback: list[str]
+    bullets: Annotated[list[Bullet], update_bullets]
     iteration_count: int  # Track how many times we've tried to improve
+    # Per-run iteration history (see track_iteration). Each entry stores the bullets'
+    # cache keys, and bullet_texts maps each key to its text once, so bullets kept
+    # across iterations are not stored again
+    history: Annotated[list, operator.add]
+    bullet_texts: Annotated[dict, operator.or_]
+
+# State sent to each parallel evaluate_one branch (one bullet point each)
+class JudgeState(TypedDict):
+    bullet: Bullet
+    idx: int
+    job: str
 
-# Helper function to extract bullet points from text
-def extract_bullet_points(text):
-    """
-    Extract exactly 4 bullet points from text using regex and fallback methods.
-    Returns a list of clean bullet point strings.
-    """
-    import re
-    
-    # Try to find bullet points with various markers (-, •, *, etc.)
-    bullet_pattern = re.compile(r'[-•*]\s*(.*?)(?=\n[-•*]|\n\n|$)', re.DOTALL)
-    bullets = bullet_pattern.findall(text)
-    
-    # Try numbered lists if bullet points weren't found or insufficient
-    if len(bullets) != 4:
-        numbered_pattern = re.compile(r'\d+\.\s*(.*?)(?=\n\d+\.|\n\n|$)', re.DOTALL)
-        bullets = numbered_pattern.findall(text)
-    
-    # Last resort: just split by newlines and clean
-    if len(bullets) != 4:
-        bullets = [line.strip() for line in text.split('\n') 
-                  if line.strip() and not line.strip().lower().startswith(('experience', 'job', 'position'))]
-    
-    # Clean and ensure we have exactly 4 bullets
-    bullets = [b.strip() for b in bullets if b.strip()]
-    
-    # Return exactly 4 bullets (truncate or pad as needed)
-    if len(bullets) > 4:
-        return bullets[:4]
-    elif len(bullets) < 4:
-        # Pad with empty strings if we don't have enough
-        return bullets + ["" for _ in range(4 - len(bullets))]
-    
-    return bullets
-
-# 5. Node: Generate an experience with 4 bullet points
-def generate_experience(state: State):
-    """
-    LLM generates one realistic work experience for the given job, with 4 bullet points.
-    Each bullet point should be about 30 words, sound human, highlight technical skills, and be recruiter-friendly.
-    Uses feedback from previous iterations if available.
-    """
-    # Track iteration count
-    iterations = state.get("iteration_count", 0) + 1
-    
-    # Build a more sophisticated prompt
-    prompt = f"""Generate ONE realistic professional experience for a {state['job']} role.
-
-Requirements:
-1. Must have EXACTLY 4 bullet points
-2. Each bullet point should be 25-35 words
-3. START each bullet point with a SPECIFIC, POWERFUL ACTION VERB (e.g., 'Implemented', 'Engineered', 'Developed', 'Designed', 'Constructed')
-4. Be SPECIFIC and DETAILED about what exactly was done - include technical implementation details
-5. If you mention metrics or improvements, you may include context for how they were achieved, but it is not required to explain how they were measured unless it adds clarity
-6. Include specific technologies, language versions, and technical methodologies
-7. NEVER use buzzwords like 'leverage', 'synergy', 'optimize', or other vague business jargon
-8. Focus on TECHNICAL work and CONCRETE achievements
-9. Use specific numbers and percentages with context, but do not always add 'as measured by' or 'as verified by'
-10. Write in a natural, human voice that a real engineer would use in their resume
+# The experience as resume text ("- bullet" lines)
+def format_experience(bullets: list[Bullet]) -> str:
+    return "\n".join(f"- {b.text}" for b in bullets if b.text)
+
+# Requirements every generated or rewritten bullet point must follow
+BULLET_GUIDELINES = """Requirements for every bullet point:
+1. Each bullet point should be 25-35 words
+2. START each bullet point with a SPECIFIC, POWERFUL ACTION VERB (e.g., 'Implemented', 'Engineered', 'Developed', 'Designed', 'Constructed')
+3. Be SPECIFIC and DETAILED about what exactly was done - include technical implementation details
+4. If you mention metrics or improvements, you may include context for how they were achieved, but it is not required to explain how they were measured unless it adds clarity
+5. Include specific technologies, language versions, and technical methodologies
+6. NEVER use buzzwords like 'leverage', 'synergy', 'optimize', or other vague business jargon
+7. Focus on TECHNICAL work and CONCRETE achievements
+8. Use specific numbers and percentages with context, but do not always add 'as measured by' or 'as verified by'
+9. Write in a natural, human voice that a real engineer would use in their resume
 
 Format each bullet point as: "ACTION VERB + specific technical task + specific implementation details + measurable outcome"
 
@@ -109,246 +107,279 @@ EXAMPLES OF GOOD BULLET POINTS:
 ✅ "Rebuilt authentication service using JWT tokens and Express middleware, reducing server response time from 1.2s to 300ms"
 ✅ "Implemented Redis caching layer for product catalog API endpoints, decreasing database load by 73% during peak traffic periods"
 """
+
+# Generator prompts, built once here; only {job} and the bullets to rewrite are filled in per call
+PROMPT_GEN = """Generate ONE realistic professional experience for a {job} role.
+It must have EXACTLY 4 bullet points.
+
+""" + BULLET_GUIDELINES
+
+PROMPT_REWRITE = """Rewrite the following resume bullet points for a {job} role, addressing the feedback for each one.
+Return exactly {count} rewritten bullet point(s), in the same order.
+
+{to_rewrite}
+
+""" + BULLET_GUIDELINES
+
+# 5. Node: Generate an experience with 4 bullet points
+async def generate_experience(state: State):
+    """
+    LLM generates one realistic work experience for the given job, with 4 bullet points.
+    Each bullet point should be about 30 words, sound human, highlight technical skills, and be recruiter-friendly.
+    On later iterations only the bullet points that failed evaluation are rewritten, using their feedback;
+    passing bullet points are kept as they are.
+    """
+    # Track iteration count
+    iterations = state.get("iteration_count", 0) + 1
+    job = state["job"]
+    bullets = list(state.get("bullets") or [Bullet() for _ in range(4)])
+    failed = [i for i, b in enumerate(bullets) if b.grade != "pass"]
     
-    # Add previous feedback if this isn't the first attempt
-    if iterations > 1 and any(fb for fb in state.get("feedback", []) if fb):
-        prompt += "\n\nPrevious feedback to address:\n"
-        for i, fb in enumerate(state.get("feedback", [])):
-            if fb:
-                prompt += f"• Bullet point {i+1}: {fb}\n"
-    
-    msg = llm.invoke(prompt)
-    experience = msg.content.strip()
+    if iterations == 1 or not any(b.text for b in bullets):
+        # First attempt: generate all 4 bullet points
+        prompt = PROMPT_GEN.format(job=job)
+        failed = list(range(4))
+    else:
+        # Later attempts: rewrite only the failed bullet points, addressing their feedback
+        to_rewrite = "\n".join(
+            f'{n+1}. "{bullets[i].text}"\n   Feedback: {bullets[i].feedback or "Missing bullet point."}'
+            for n, i in enumerate(failed)
+        )
+        prompt = PROMPT_REWRITE.format(job=job, count=len(failed), to_rewrite=to_rewrite)
     
-    # Extract bullet points using our robust helper function
-    bullet_points = extract_bullet_points(experience)
+    # One structured call returns the new bullet points as a list
+    new_bullets = [b.strip() for b in (await generator.ainvoke(prompt)).bullets]
     
-    # If we've tried 5 times and still having issues, use a simpler approach for the missing ones
-    if iterations >= 5 and "" in bullet_points:
-        # Generate individual bullets for any missing ones
-        for i, bp in enumerate(bullet_points):
-            if not bp:
-                simple_prompt = f"Write one realistic resume bullet point for a {state['job']} position. Around 30 words, with specific technical details and measurable results."
-                simple_msg = llm.invoke(simple_prompt)
-                bullet_points[i] = simple_msg.content.strip()
+    # Splice the new bullet points into their positions as ungraded records
+    # (any missing ones keep their old text and are graded again; passing ones are left alone)
+    new_texts = dict(zip(failed, new_bullets))
+    for i in failed:
+        text = new_texts.get(i, bullets[i].text)
+        bullets[i] = Bullet(text=text, key=evaluation_cache_key(job, text))
     
     return {
-        "experience": experience,
-        "bullet_points": bullet_points,
-        # Reset grades and feedback for new generation
-        "grades": ["" for _ in range(4)],
-        "feedback": ["" for _ in range(4)],
+        "bullets": bullets,
         "iteration_count": iterations  # Track iterations
     }
 
-# 6. Node: Strictly evaluate each bullet point
-def evaluate_bullet_points(state: State):
+# 6. Nodes: Strictly evaluate each bullet point
+#    The rubric is the same for every call, so it is a short static system message
+#    and only the tiny user message (bullet + job) changes from call to call.
+#    Note: at roughly 280 tokens it is below the 1024-token minimum for OpenAI's
+#    automatic prompt caching, so the saving comes from sending fewer tokens, not from cache hits
+SYSTEM_RUBRIC = """You strictly grade one resume bullet point for the given job. FAIL it if ANY rule is broken:
+1. Realistic: achievable for the role, with industry-standard tools and believable metrics (no "90% faster page load").
+2. Specific: says exactly what was built and how, not generic descriptions.
+3. Metrics: numbers need context on what improved; "as measured by" is not required.
+4. No buzzwords: leverage, utilize, optimize, synergy, streamline, facilitate, robust, paradigm, empower.
+5. Starts with a strong technical action verb.
+6. Technical detail: names technologies and how they were applied.
+7. Length: 25-35 words.
+Grade "pass" only if all rules hold. On "fail", give specific, actionable feedback on the weakest rules.
+
+FAIL examples:
+- "Leveraged React to improve website performance" (vague, buzzword)
+- "Spearheaded the redesign of an e-commerce platform using React and Node.js, boosting page load speed by 40%" (unclear metric)
+PASS examples:
+- "Rebuilt authentication microservice using JWT tokens and bcrypt hashing, reducing server response time from 1.2s to 300ms"
+- "Implemented Redis caching strategy for product catalog API, cutting database load by 73% during Black Friday traffic spike"
+"""
+
+# The system message never changes, so the same dict is reused for every call
+RUBRIC_MESSAGE = {"role": "system", "content": SYSTEM_RUBRIC}
+
+def build_evaluation_prompt(bp, job):
+    """Build the evaluation messages for one bullet point: static rubric + tiny user message."""
+    return [RUBRIC_MESSAGE, {"role": "user", "content": f'Bullet: "{bp}"\nJob: {job}'}]
+
+# Cache of evaluations keyed on (job, bullet text)
+# Bullets that come back unchanged in a later iteration reuse their evaluation instead of
+# being graded again (temperature is low, so re-grading would give near-identical results).
+# It is an LRU capped at EVAL_CACHE_SIZE entries, so a long-lived process doesn't keep
+# every grade forever. All access happens on the event loop thread between awaits, so no lock is needed
+EVAL_CACHE_SIZE = 512
+_eval_cache: "OrderedDict[str, BulletPointEvaluation]" = OrderedDict()
+
+def evaluation_cache_key(job, bp):
+    """Hash the job and bullet text into a cache key."""
+    return hashlib.sha256(f"{job}|{bp}".encode()).hexdigest()
+
+# Fan out: one evaluate_one branch per ungraded bullet point
+# LangGraph runs the Send branches in parallel, and each shows up as its own trace span
+def dispatch_evaluations(state: State):
+    return [
+        Send("evaluate_one", {"bullet": b, "idx": i, "job": state["job"]})
+        for i, b in enumerate(state["bullets"])
+        if not b.grade
+    ]
+
+async def evaluate_one(judge: JudgeState):
     """
-    Evaluates each bullet point for realism, length, and human-like language. Strict: all must pass.
-    Enhanced evaluation criteria for high-quality resume content.
+    Evaluates one bullet point for realism, length, and human-like language.
+    Bullet points that were already graded for this job are taken from the cache.
     """
-    grades = []
-    feedback = []
-    for i, bp in enumerate(state["bullet_points"]):
-        # Skip empty bullet points (shouldn't happen, but just in case)
-        if not bp:
-            grades.append("fail")
-            feedback.append("Missing bullet point. Please generate a complete bullet point.")
-            continue
-            
-        prompt = f"""
-Evaluate the following resume bullet point for a {state['job']} position:
-
-"{bp}"
-
-Evaluate based on these STRICT criteria:
-
-1. REALISTIC & ACCURACY: Is the accomplishment technically plausible and realistic for a professional in this role? Are the tools, frameworks, and metrics industry-standard and believable? Would a senior engineer or hiring manager find this bullet point credible and achievable? 
-   - FAIL if the bullet point describes an unrealistic outcome (e.g., "reduced page load time by 90%" for a modern app), uses tools in an implausible way, or claims something not possible for the job level.
-   - PASS only if the accomplishment is achievable and the technologies are used as expected in the industry.
-
-2. SPECIFICITY: Does it describe EXACTLY what was done with specific implementation details? Does it avoid vague generalizations?
-   - FAIL if it uses generic descriptions without technical specifics
-   - PASS only if it explains precisely what technologies were used and how
-
-3. METRICS CONTEXT: For any metrics or improvements mentioned, does it use numbers and percentages with context? It is NOT required to explain how they were measured unless it adds clarity.
-   - FAIL if it mentions percentages or numbers with no context at all (e.g., "improved speed by 40%" with no mention of what was improved)
-   - PASS if the metric is clear and relevant, but do not require 'as measured by' or 'as verified by' unless it adds value
-
-4. BUZZWORD FREE: Is it completely free from vague business jargon and buzzwords?
-   - FAIL if it contains any of these words: leverage, utilize, optimize, synergy, streamline, facilitate, robust, paradigm, empower
-   - PASS only if it uses concrete, specific language
-
-5. STRONG ACTION VERB: Does it start with a specific, powerful action verb?
-   - FAIL if it doesn't start with a strong technical action verb
-   - PASS only if it begins with a verb that clearly describes a technical action
-
-6. TECHNICAL DETAIL: Does it include specific technologies, versions, or methodologies?
-   - FAIL if technologies are mentioned without implementation details
-   - PASS only if it describes how the technologies were applied
-
-7. LENGTH: Is it between 25-35 words?
-   - FAIL if significantly shorter or longer
-
-If the bullet point passes ALL criteria, grade it as "pass".
-If it fails ANY criteria, grade it as "fail" and provide specific, actionable feedback focused on the weakest areas. BE STRICT IN YOUR EVALUATION.
-
-EXAMPLES OF FAILING BULLET POINTS:
-❌ "Developed a responsive web application using React 17 and TypeScript, integrating with a Node.js backend via RESTful APIs, resulting in a 90% faster page load time for end-users." - not realistic, metric is not plausible
-❌ "Leveraged React to improve website performance" - too vague, uses buzzword, no specifics
-❌ "Spearheaded the redesign of an e-commerce platform using React and Node.js, boosting page load speed by 40%" - metric is unclear, not specific enough
-
-EXAMPLES OF PASSING BULLET POINTS:
-✅ "Rebuilt authentication microservice using JWT tokens and bcrypt hashing, reducing server response time from 1.2s to 300ms"
-✅ "Implemented Redis caching strategy for product catalog API, cutting database load by 73% during Black Friday traffic spike"
-"""
-        
-        # Get the result and check if we're at max iterations
-        result = evaluator.invoke(prompt)
-        
-        # Force pass after 5 iterations to prevent infinite loops
-        if state.get("iteration_count", 0) >= 5:
-            # Still keep the feedback, but force pass grade
-            grades.append("pass")
-            # If it actually failed, keep the feedback
-            if result.grade == "fail":
-                feedback.append(f"Forced pass after 5 iterations. Original feedback: {result.feedback}")
-            else:
-                feedback.append(result.feedback)
-        else:
-            # Normal behavior for iterations < 5
-            grades.append(result.grade)
-            feedback.append(result.feedback)
-            
-    return {"grades": grades, "feedback": feedback}
+    bullet = judge["bullet"]
+    # Skip empty bullet points (shouldn't happen, but just in case)
+    if not bullet.text:
+        graded = replace(bullet, grade="fail", feedback="Missing bullet point. Please generate a complete bullet point.")
+        return {"bullets": {judge["idx"]: graded}}
+
+    result = _eval_cache.get(bullet.key)
+    if result is not None:
+        _eval_cache.move_to_end(bullet.key)  # Mark as most recently used
+    else:
+        result = await evaluator.ainvoke(build_evaluation_prompt(bullet.text, judge["job"]))
+        _eval_cache[bullet.key] = result
+        if len(_eval_cache) > EVAL_CACHE_SIZE:
+            _eval_cache.popitem(last=False)  # Drop the least recently used grade
+    # Fan in: the update_bullets reducer writes each branch's result into its own slot
+    return {"bullets": {judge["idx"]: replace(bullet, grade=result.grade, feedback=result.feedback)}}
 
 # 7. Conditional routing: only pass if ALL bullet points pass
+#    Kept free of printing so the decision itself is cheap.
+#    After MAX_ITERS rounds we stop anyway. Passing bullet points are kept and never
+#    re-graded, so the latest round is always the best one so far
+MAX_ITERS = 3
+
 def route_bullet_points(state: State):
-    # Log the current iteration's results
+    if state["iteration_count"] >= MAX_ITERS:
+        return "Accepted"
+    return "Accepted" if all(b.grade == "pass" for b in state["bullets"]) else "Rejected + Feedback"
+
+# Print one iteration's results (only runs when OPTIMIZER_VERBOSE is set)
+def log_iteration(state: State):
+    out = []  # Collect the lines and write them once at the end
     current_iteration = state.get("iteration_count", 0)
     
-    print(f"\n{'-'*40}\nITERATION {current_iteration} RESULTS\n{'-'*40}")
-    print("\nCurrent Bullet Points:")
-    for i, bp in enumerate(state["bullet_points"]):
-        grade_symbol = "✅" if state["grades"][i] == "pass" else "❌"
-        print(f"{grade_symbol} {i+1}. {bp}")
-        print(f"   Word count: {len(bp.split())} words")
-        if state["grades"][i] == "fail":
-            print(f"   Feedback: {state['feedback'][i]}")
+    out.append(f"\n{'-'*40}\nITERATION {current_iteration} RESULTS\n{'-'*40}")
+    out.append("\nCurrent Bullet Points:")
+    for i, b in enumerate(state["bullets"]):
+        grade_symbol = "✅" if b.grade == "pass" else "❌"
+        out.append(f"{grade_symbol} {i+1}. {b.text}")
+        out.append(f"   Word count: {len(b.text.split())} words")
+        if b.grade == "fail":
+            out.append(f"   Feedback: {b.feedback}")
     
-    # Determine if we need another iteration
-    all_passed = all(g == "pass" for g in state["grades"])
-    if all_passed:
-        print(f"\n✨ All bullet points passed! Optimization complete.")
-        return "Accepted"
+    if all(b.grade == "pass" for b in state["bullets"]):
+        out.append(f"\n✨ All bullet points passed! Optimization complete.")
     else:
-        failed_count = sum(1 for g in state["grades"] if g == "fail")
-        print(f"\n🔄 {failed_count} bullet point(s) need improvement. Proceeding to next iteration...")
-        return "Rejected + Feedback"
-
-# 8. Build the workflow graph
-optimizer_builder = StateGraph(State)
+        failed_count = sum(1 for b in state["bullets"] if b.grade == "fail")
+        out.append(f"\n🔄 {failed_count} bullet point(s) need improvement. Proceeding to next iteration...")
+    
+    sys.stdout.write("\n".join(out) + "\n")
 
-# Create a tracking node to capture iteration history
+# Create a tracking node to capture iteration history once the bullets are graded
+# The history lives in the graph state, so every run (e.g. each server request) has its own
 def track_iteration(state: State):
     """Capture the current state for logging purposes."""
-    capture_iteration(state)
-    return {}
-
-# Add nodes (steps)
-optimizer_builder.add_node("generate_experience", generate_experience)
-optimizer_builder.add_node("evaluate_bullet_points", evaluate_bullet_points)
-optimizer_builder.add_node("track_iteration", track_iteration)  # Add tracking node
-optimizer_builder.add_edge(START, "generate_experience")
-optimizer_builder.add_edge("generate_experience", "track_iteration")  # Add tracking edge
-optimizer_builder.add_edge("track_iteration", "evaluate_bullet_points")  # Update edge
-optimizer_builder.add_conditional_edges(
-    "evaluate_bullet_points",
-    route_bullet_points,
-    {"Accepted": END, "Rejected + Feedback": "generate_experience"}
-)
-
-# 9. Compile the workflow
-graph = optimizer_builder.compile()
-
-# Store history of all iterations for logging
-iteration_history = []
-
-# Helper function to capture each iteration's state
-def capture_iteration(state):
-    """Add the current state to iteration history for later analysis"""
-    iteration_history.append({
+    if os.getenv("OPTIMIZER_VERBOSE"):
+        log_iteration(state)
+    known = state.get("bullet_texts") or {}
+    entry = {
         "iteration": state.get("iteration_count", 0),
-        "bullet_points": state["bullet_points"].copy(),
-        "grades": state["grades"].copy(),
-        "feedback": state["feedback"].copy()
-    })
+        "bullet_keys": tuple(b.key for b in state["bullets"]),
+        "grades": tuple(b.grade for b in state["bullets"]),
+        "feedback": tuple(b.feedback for b in state["bullets"]),
+    }
+    return {
+        "history": [entry],
+        "bullet_texts": {b.key: b.text for b in state["bullets"] if b.key not in known},
+    }
+
+# 8. Build and compile the workflow graph
+#    lru_cache makes this run once per process: every caller (this script, or a
+#    server that imports the module) reuses the same compiled graph
+@lru_cache(maxsize=1)
+def _build_graph():
+    optimizer_builder = StateGraph(State)
+
+    # Add nodes (steps)
+    optimizer_builder.add_node("generate_experience", generate_experience)
+    optimizer_builder.add_node("evaluate_one", evaluate_one)  # Runs once per bullet, in parallel
+    optimizer_builder.add_node("track_iteration", track_iteration)  # Add tracking node
+    optimizer_builder.add_edge(START, "generate_experience")
+    optimizer_builder.add_conditional_edges("generate_experience", dispatch_evaluations, ["evaluate_one"])  # Fan out
+    optimizer_builder.add_edge("evaluate_one", "track_iteration")  # Fan in, then add tracking edge
+    optimizer_builder.add_conditional_edges(
+        "track_iteration",
+        route_bullet_points,
+        {"Accepted": END, "Rejected + Feedback": "generate_experience"}
+    )
+
+    # 9. Compile the workflow
+    return optimizer_builder.compile()
+
+graph = _build_graph()
 
 # 10. Run the workflow with an example job
 def print_result(state):
-    print("\n" + "="*80)
-    print("FINAL OPTIMIZED EXPERIENCE\n" + "="*80)
+    out = []  # Collect the lines and write them once at the end
+    out.append("\n" + "="*80)
+    out.append("FINAL OPTIMIZED EXPERIENCE\n" + "="*80)
     
-    print("\nComplete Experience:")
-    print(state["experience"])
+    out.append("\nComplete Experience:")
+    out.append(format_experience(state["bullets"]))
     
-    print("\nBullet Points:")
-    for i, bp in enumerate(state["bullet_points"]):
-        grade_icon = "✅" if state["grades"][i] == "pass" else "❌"
-        print(f"{grade_icon} {i+1}. {bp}")
+    out.append("\nBullet Points:")
+    for i, b in enumerate(state["bullets"]):
+        grade_icon = "✅" if b.grade == "pass" else "❌"
+        out.append(f"{grade_icon} {i+1}. {b.text}")
     
-    print("\nEvaluation Details:")
-    for i, (g, fb) in enumerate(zip(state["grades"], state["feedback"])):
-        print(f"Bullet {i+1}: {g.upper()}")
-        if fb:
-            print(f"   Feedback: {fb}")
+    out.append("\nEvaluation Details:")
+    for i, b in enumerate(state["bullets"]):
+        out.append(f"Bullet {i+1}: {b.grade.upper()}")
+        if b.feedback:
+            out.append(f"   Feedback: {b.feedback}")
     
     # Add word count for each bullet point to help user
-    print("\nWord Count Analysis:")
-    for i, bp in enumerate(state["bullet_points"]):
-        word_count = len(bp.split())
+    out.append("\nWord Count Analysis:")
+    for i, b in enumerate(state["bullets"]):
+        word_count = len(b.text.split())
         status = "✅ Good length" if 25 <= word_count <= 35 else "⚠️ Length not ideal"
-        print(f"Bullet {i+1}: {word_count} words - {status}")
+        out.append(f"Bullet {i+1}: {word_count} words - {status}")
     
     # Show progress summary across all iterations if we have history
+    iteration_history = state.get("history") or []
+    bullet_texts = state.get("bullet_texts") or {}
     if len(iteration_history) > 1:
-        print("\n" + "="*80)
-        print("OPTIMIZATION JOURNEY\n" + "="*80)
-        print(f"Total Iterations: {len(iteration_history)}\n")
+        out.append("\n" + "="*80)
+        out.append("OPTIMIZATION JOURNEY\n" + "="*80)
+        out.append(f"Total Iterations: {len(iteration_history)}\n")
         
         # Calculate improvement metrics
         initial_pass_count = sum(1 for g in iteration_history[0]["grades"] if g == "pass")
         final_pass_count = sum(1 for g in iteration_history[-1]["grades"] if g == "pass")
         
-        print(f"Initial Pass Rate: {initial_pass_count}/4 bullet points ({initial_pass_count*25}%)")
-        print(f"Final Pass Rate: {final_pass_count}/4 bullet points ({final_pass_count*25}%)")
+        out.append(f"Initial Pass Rate: {initial_pass_count}/4 bullet points ({initial_pass_count*25}%)")
+        out.append(f"Final Pass Rate: {final_pass_count}/4 bullet points ({final_pass_count*25}%)")
         
         # Show evolution of each bullet point
-        print("\nBullet Point Evolution:")
+        out.append("\nBullet Point Evolution:")
         for bullet_num in range(4):
-            print(f"\nBullet #{bullet_num+1} Evolution:")
+            out.append(f"\nBullet #{bullet_num+1} Evolution:")
             for idx, iter_data in enumerate(iteration_history):
-                # Skip iterations where this bullet wasn't changed
-                if idx > 0 and iter_data["bullet_points"][bullet_num] == iteration_history[idx-1]["bullet_points"][bullet_num]:
+                # Skip iterations where this bullet wasn't changed (same key = same text)
+                key = iter_data["bullet_keys"][bullet_num]
+                if idx > 0 and key == iteration_history[idx-1]["bullet_keys"][bullet_num]:
                     continue
                     
                 iter_num = iter_data["iteration"]
-                bullet = iter_data["bullet_points"][bullet_num]
-                grade = iter_data["grades"][bullet_num] if iter_data["grades"][bullet_num] else "N/A"
+                bullet = bullet_texts[key]
+                grade = iter_data["grades"][bullet_num] or "N/A"
+                feedback = iter_data["feedback"][bullet_num]
                 word_count = len(bullet.split())
                 
                 grade_icon = "✅" if grade == "pass" else "❌" if grade == "fail" else "🔄"
-                print(f"  Iteration {iter_num}: {grade_icon} [{word_count} words]")
-                print(f"  {bullet}")
+                out.append(f"  Iteration {iter_num}: {grade_icon} [{word_count} words]")
+                out.append(f"  {bullet}")
                 
-                if grade == "fail" and iter_data["feedback"][bullet_num]:
-                    print(f"  Feedback: {iter_data['feedback'][bullet_num]}")
-                print()
+                if grade == "fail" and feedback:
+                    out.append(f"  Feedback: {feedback}")
+                out.append("")
+    
+    sys.stdout.write("\n".join(out) + "\n")
 
 if __name__ == "__main__":
-    # Clear any previous history
-    iteration_history.clear()
-    
     print("\n" + "="*80)
     print("RESUME BULLET POINT OPTIMIZER")
     print("="*80)
@@ -359,14 +390,13 @@ if __name__ == "__main__":
     
     initial_state = {
         "job": job, 
-        "experience": "", 
-        "bullet_points": ["" for _ in range(4)], 
-        "grades": ["" for _ in range(4)], 
-        "feedback": ["" for _ in range(4)],
-        "iteration_count": 0  # Start with iteration 0
+        "bullets": [Bullet() for _ in range(4)], 
+        "iteration_count": 0,  # Start with iteration 0
+        "history": [],
+        "bullet_texts": {},
     }
     
     print("Starting optimization process...")
-    final_state = graph.invoke(initial_state)
+    final_state = asyncio.run(graph.ainvoke(initial_state))
     print_result(final_state)
     print(f"\nOptimization completed in {final_state['iteration_count']} iterations.")